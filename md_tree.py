@@ -1,10 +1,23 @@
 import os
 import sys
 import argparse
-from typing import List, Iterable, Tuple, Optional, Dict, Any
-from openai import OpenAI
+import asyncio
+import codecs
+import io
+import threading
+from collections import defaultdict
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Iterable, Tuple, Optional, Dict, Any, BinaryIO, Callable
+from openai import AsyncOpenAI
+from openai.types.responses import Response
 from dotenv import load_dotenv
 import json
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
 load_dotenv()
 
 DEFAULT_EXCLUDES = {
@@ -20,133 +33,450 @@ DEFAULT_EXCLUDES = {
 INDENT = "    " 
 
 
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
 def human_size(num: int) -> str:
-    for unit in ["B","KB","MB","GB","TB"]:
-        if num < 1024.0:
-            return f"{num:.0f}{unit}" if unit == "B" else f"{num:.1f}{unit}"
-        num /= 1024.0
-    return f"{num:.1f}PB"
+    # unit index straight from the bit length instead of a divide-and-compare loop
+    idx = (num.bit_length() - 1) // 10 if num >= 1024 else 0
+    if not idx:
+        return f"{num}B"
+    idx = min(idx, len(SIZE_UNITS) - 1)
+    return f"{num / (1 << 10 * idx):.1f}{SIZE_UNITS[idx]}"
+
+# ASCII lookup table indexed by code point; str.translate leaves characters
+# past the end (IndexError is a LookupError) unchanged
+_MD_ESCAPE = [chr(i) for i in range(128)]
+for _ch in "\\*_`[]()#+!>|":
+    _MD_ESCAPE[ord(_ch)] = f"\\{_ch}"
+del _ch
 
 def escape_md(name: str) -> str:
-    for ch in ["\\", "*", "_", "`", "[", "]", "(", ")", "#", "+", "!", ">", "|"]:
-        name = name.replace(ch, f"\\{ch}")
-    return name
+    return name.translate(_MD_ESCAPE)
+
+def dump_json(obj: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def _lower_name(entry: os.DirEntry) -> str:
+    return entry.name.lower()
 
 def iter_entries(path: str) -> Iterable[os.DirEntry]:
+    # directories first, then case-insensitive by name; partitioning once
+    # leaves the sort comparing plain strings instead of key tuples
     try:
         with os.scandir(path) as it:
             entries = list(it)
     except PermissionError:
         return []
-    entries.sort(key=lambda e: (not e.is_dir(follow_symlinks=False), e.name.lower()))
-    return entries
-
-def build_tree_json(
+    dirs: List[os.DirEntry] = []
+    files: List[os.DirEntry] = []
+    for entry in entries:
+        (dirs if entry.is_dir(follow_symlinks=False) else files).append(entry)
+    dirs.sort(key=_lower_name)
+    files.sort(key=_lower_name)
+    dirs += files
+    return dirs
+
+NODE_DIR, NODE_FILE, NODE_UNKNOWN = 0, 1, 2
+NODE_TYPES = ("dir", "file", "unknown")
+FLAG_LINK, FLAG_CYCLE = 1, 2
+
+@dataclass
+class TreeSoA:
+    # One slot per node in each array; node 0 is the root and the children of
+    # a directory occupy a contiguous index range. relpaths are not stored,
+    # they are rebuilt from the names while walking.
+    types: bytearray = field(default_factory=bytearray)
+    flags: bytearray = field(default_factory=bytearray)
+    names: List[str] = field(default_factory=list)
+    sizes: array = field(default_factory=lambda: array("q"))  # -1 if unreadable
+    parent_idx: array = field(default_factory=lambda: array("i"))
+    first_child: array = field(default_factory=lambda: array("i"))
+    n_children: array = field(default_factory=lambda: array("i"))
+    # (st_dev, st_ino) of each listed directory, only when following symlinks
+    dir_inodes: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    show_sizes: bool = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+class _ScanCancelled(Exception):
+    pass
+
+class _ScanState:
+    # Which directories have been listed, plus the first scan error. Readers
+    # wait on one Condition instead of holding a Future per directory. Once
+    # stop is set, the next check() records a cancellation as that error.
+    __slots__ = ("cond", "listed", "pending", "error", "stop")
+
+    def __init__(self, stop: Optional[threading.Event] = None) -> None:
+        self.cond = threading.Condition(threading.Lock())
+        self.listed = bytearray()  # parallel to the tree arrays
+        self.pending = 0
+        self.error: Optional[BaseException] = None
+        self.stop = stop
+
+    def check(self) -> None:
+        if self.error is None and self.stop is not None and self.stop.is_set():
+            with self.cond:
+                if self.error is None:
+                    self.error = _ScanCancelled("scan cancelled")
+                self.cond.notify_all()
+        if self.error is not None:
+            raise self.error
+
+    def wait(self, idx: int) -> None:
+        if not self.listed[idx]:
+            with self.cond:
+                self.cond.wait_for(lambda: self.listed[idx] or self.error is not None)
+        if self.error is not None:
+            raise self.error
+
+    def wait_all(self) -> None:
+        with self.cond:
+            self.cond.wait_for(lambda: not self.pending or self.error is not None)
+        if self.error is not None:
+            raise self.error
+
+def _start_scan(
     root: str,
-    max_depth: int = 0,
-    include_hidden: bool = False,
-    show_sizes: bool = False,
-    excludes: set = DEFAULT_EXCLUDES,
-    follow_symlinks: bool = False,
-) -> Dict[str, Any]:
+    executor: ThreadPoolExecutor,
+    max_depth: int,
+    include_hidden: bool,
+    show_sizes: bool,
+    excludes: set,
+    follow_symlinks: bool,
+    stop: Optional[threading.Event] = None,
+) -> Tuple[TreeSoA, _ScanState]:
+    # Returns the tree as it is being filled and the state to wait on. A
+    # listing submits its subdirectories' listings before it is marked done.
+    # Setting stop makes the remaining listings fail fast.
     root = os.path.abspath(os.path.expanduser(root))
     root_name = os.path.basename(root) or root
 
-    seen_inodes: set[Tuple[int, int]] = set()  # for safe symlink following
+    tree = TreeSoA(show_sizes=show_sizes)
+    state = _ScanState(stop)
+    tree_lock = state.cond
 
-    def should_skip(name: str) -> bool:
-        if name in excludes: return True
-        if not include_hidden and name.startswith("."): return True
-        return False
+    # loop-invariant skip rules, checked inline for every entry
+    excluded = frozenset(excludes)
+    skip_hidden = not include_hidden
 
-    def inode_of(path: str) -> Tuple[int, int]:
-        try:
-            st = os.stat(path, follow_symlinks=follow_symlinks)
-            return (st.st_dev, st.st_ino)
-        except Exception:
-            return (-1, -1)
+    def submit(idx: int, path: str, depth: int, dir_entry: Optional[os.DirEntry], ancestors: tuple) -> None:
+        with tree_lock:
+            state.listed[idx] = 0
+            state.pending += 1
+        # the returned Future is dropped; completion is tracked in state
+        executor.submit(scan_dir, idx, path, depth, dir_entry, ancestors)
 
-    def make_node(path: str, relpath: str, depth: int) -> Dict[str, Any]:
+    def scan_dir(idx: int, path: str, depth: int, dir_entry: Optional[os.DirEntry], ancestors: tuple) -> None:
         try:
-            is_dir = os.path.isdir(path) if follow_symlinks else os.path.isdir(path) and not os.path.islink(path)
-        except Exception:
-            is_dir = False
-
-        if is_dir:
-            node: Dict[str, Any] = {
-                "type": "dir",
-                "name": os.path.basename(path) or relpath,
-                "relpath": relpath or ".",
-                "children": []
-            }
-            if max_depth and depth > max_depth:
-                return node
-
-            # handle symlink cycles if following
-            if follow_symlinks:
-                ino = inode_of(path)
-                if ino in seen_inodes:
-                    node["cycle_detected"] = True
-                    return node
-                seen_inodes.add(ino)
-
-            for entry in iter_entries(path):
-                if should_skip(entry.name):
-                    continue
-                child_rel = os.path.join(relpath, entry.name) if relpath else entry.name
-                child_path = os.path.join(path, entry.name)
-
-                try:
-                    is_link = os.path.islink(child_path)
-                    is_dir_child = entry.is_dir(follow_symlinks=follow_symlinks)
-                except PermissionError:
-                    node["children"].append({
-                        "type": "unknown",
-                        "name": entry.name,
-                        "relpath": child_rel,
-                        "error": "permission_denied"
-                    })
-                    continue
-
-                if is_dir_child:
-                    node["children"].append(make_node(child_path, child_rel, depth + 1))
-                else:
-                    file_node: Dict[str, Any] = {
-                        "type": "file",
-                        "name": entry.name,
-                        "relpath": child_rel,
-                        "is_link": is_link,
-                        "ext": os.path.splitext(entry.name)[1]
-                    }
-                    if show_sizes:
-                        try:
-                            size_bytes = os.path.getsize(child_path)
-                            file_node["size"] = human_size(size_bytes)
-                            file_node["size_bytes"] = size_bytes
-                        except Exception:
-                            file_node["size"] = "?"
-                    node["children"].append(file_node)
-
-            return node
+            # a failed or cancelled scan lists nothing more
+            state.check()
+            list_dir(idx, path, depth, dir_entry, ancestors)
+        except BaseException as e:
+            with tree_lock:
+                if state.error is None:
+                    state.error = e
+        finally:
+            with tree_lock:
+                state.listed[idx] = 1
+                state.pending -= 1
+                tree_lock.notify_all()
+
+    def list_dir(idx: int, path: str, depth: int, dir_entry: Optional[os.DirEntry], ancestors: tuple) -> None:
+        # handle symlink cycles if following; without it there are none to find
+        if follow_symlinks:
+            try:
+                # the stat is cached on the parent's DirEntry
+                st = dir_entry.stat() if dir_entry is not None else os.stat(path)
+                key = (st.st_dev, st.st_ino)
+            except Exception:
+                key = (-1, -1)
+            with tree_lock:
+                tree.dir_inodes[idx] = key
+            # Only a true loop is cut here. Repeats elsewhere in the tree are
+            # marked by the writer in DFS order, so the output does not depend
+            # on which worker got there first.
+            if key in ancestors:
+                return
+            ancestors += (key,)
+
+        # per-entry work is plain Python, so keep lookups out of the loop
+        types = bytearray()
+        flags = bytearray()
+        names: List[str] = []
+        sizes = array("q")
+        subdirs: List[Tuple[int, os.DirEntry]] = []
+        descend = not max_depth or depth < max_depth
+        for entry in iter_entries(path):
+            name = entry.name
+            # scandir never yields empty names, so name[0] is safe
+            if name in excluded or (skip_hidden and name[0] == "."):
+                continue
+
+            # DirEntry caches d_type and stat results, so no extra syscalls here
+            try:
+                is_link = entry.is_symlink()
+                is_dir_child = entry.is_dir(follow_symlinks=follow_symlinks)
+            except PermissionError:
+                types.append(NODE_UNKNOWN)
+                flags.append(0)
+                names.append(name)
+                sizes.append(0)
+                continue
+
+            size_bytes = 0
+            if is_dir_child:
+                if descend:
+                    subdirs.append((len(names), entry))
+                types.append(NODE_DIR)
+                flags.append(0)
+            else:
+                if show_sizes:
+                    try:
+                        size_bytes = entry.stat().st_size
+                    except Exception:
+                        size_bytes = -1
+                types.append(NODE_FILE)
+                flags.append(FLAG_LINK if is_link else 0)
+            names.append(name)
+            sizes.append(size_bytes)
+
+        count = len(names)
+        with tree_lock:
+            base = len(tree.names)
+            tree.types += types
+            tree.flags += flags
+            tree.names += names
+            tree.sizes += sizes
+            tree.parent_idx += array("i", [idx]) * count
+            tree.first_child += array("i", [0]) * count
+            tree.n_children += array("i", [0]) * count
+            state.listed += b"\x01" * count  # until submitted for listing
+            tree.first_child[idx] = base
+            tree.n_children[idx] = count
+
+        # listed by their own tasks while the writer catches up
+        for offset, entry in subdirs:
+            submit(base + offset, entry.path, depth + 1, entry, ancestors)
+
+    try:
+        is_dir = os.path.isdir(root) if follow_symlinks else os.path.isdir(root) and not os.path.islink(root)
+    except Exception:
+        is_dir = False
+
+    if is_dir:
+        tree.types.append(NODE_DIR)
+        tree.flags.append(0)
+        tree.names.append(root_name)
+        tree.sizes.append(0)
+    else:
+        # root could be a file
+        size_bytes = 0
+        if show_sizes:
+            try:
+                size_bytes = os.path.getsize(root)
+            except Exception:
+                size_bytes = -1
+        tree.types.append(NODE_FILE)
+        tree.flags.append(FLAG_LINK if os.path.islink(root) else 0)
+        tree.names.append(os.path.basename(root))
+        tree.sizes.append(size_bytes)
+    tree.parent_idx.append(-1)
+    tree.first_child.append(0)
+    tree.n_children.append(0)
+    state.listed.append(1)
+    # only once every root slot exists, or a worker could append past it
+    if is_dir:
+        submit(0, root, 0, None, ())
+    return tree, state
+
+def scan_tree(
+    root: str,
+    max_depth: int = 0,
+    include_hidden: bool = False,
+    show_sizes: bool = False,
+    excludes: set = DEFAULT_EXCLUDES,
+    follow_symlinks: bool = False,
+    max_workers: int = 60,
+) -> TreeSoA:
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        tree, state = _start_scan(root, executor, max_depth, include_hidden, show_sizes, excludes, follow_symlinks)
+        state.wait_all()
+        return tree
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def _leaf_nodes(tree: TreeSoA, start: int, end: int, prefix: str) -> List[Dict[str, Any]]:
+    # flat dicts for the non-directory nodes start..end, which share a parent
+    types, flags, names, sizes = tree.types, tree.flags, tree.names, tree.sizes
+    show_sizes = tree.show_sizes
+    nodes: List[Dict[str, Any]] = []
+    append = nodes.append
+    for idx in range(start, end):
+        name = names[idx]
+        if types[idx] == NODE_UNKNOWN:
+            append({"type": "unknown", "name": name, "relpath": prefix + name, "error": "permission_denied"})
+            continue
+        # same result as os.path.splitext(name)[1] for a bare name: leading
+        # dots (".bashrc", "...") do not start an extension
+        dot = name.rfind(".")
+        node: Dict[str, Any] = {
+            "type": "file",
+            "name": name,
+            "relpath": prefix + name,
+            "is_link": bool(flags[idx] & FLAG_LINK),
+            "ext": name[dot:] if dot > 0 and (name[0] != "." or name[:dot].lstrip(".")) else ""
+        }
+        if show_sizes:
+            size_bytes = sizes[idx]
+            if size_bytes < 0:
+                node["size"] = "?"
+            else:
+                node["size"] = human_size(size_bytes)
+                node["size_bytes"] = size_bytes
+        append(node)
+    return nodes
+
+# Written pieces match dump_json's compact and indent=2 output. Only flat dicts
+# go through dump_json; indented ones are shifted to their nesting level.
+def _nl(level: int) -> bytes:
+    return b"\n" + b"  " * level
+
+def _json_leaf(pretty: bool, node: Dict[str, Any], level: int) -> bytes:
+    if not pretty:
+        return dump_json(node)
+    return dump_json(node, pretty=True).replace(b"\n", _nl(level))
+
+def _json_dir_open(pretty: bool, node: Dict[str, Any], level: int) -> bytes:
+    if not pretty:
+        return dump_json(node)[:-1] + b',"children":['
+    head = dump_json(node, pretty=True)[:-2].replace(b"\n", _nl(level))
+    return head + b"," + _nl(level + 1) + b'"children": ['
+
+def _json_dir_close(pretty: bool, level: int, has_children: bool, cycle_detected: bool) -> bytes:
+    if not pretty:
+        return b'],"cycle_detected":true}' if cycle_detected else b"]}"
+    tail = b"," + _nl(level + 1) + b'"cycle_detected": true' if cycle_detected else b""
+    return (_nl(level + 1) if has_children else b"") + b"]" + tail + _nl(level) + b"}"
+
+def _json_leaf_run(pretty: bool, nodes: List[Dict[str, Any]], index: int, level: int) -> bytes:
+    sep = b"," if index else b""
+    if not pretty:
+        return sep + dump_json(nodes)[1:-1]
+    # items of a top-level indented list sit one level in; shift them to level
+    return sep + dump_json(nodes, pretty=True)[1:-2].replace(b"\n", _nl(level - 1))
+
+def _json_child_sep(pretty: bool, index: int, level: int) -> bytes:
+    if not pretty:
+        return b"," if index else b""
+    return (b"," if index else b"") + _nl(level)
+
+def _write_tree_json(
+    tree: TreeSoA,
+    outputs: List[Tuple[BinaryIO, bool]],
+    state: Optional[_ScanState],
+) -> None:
+    # Walks the tree by index and writes it to each (stream, indented) output.
+    # With a scan state, each directory is waited for before its children are read.
+    parts: List[List[bytes]] = [[] for _ in outputs]
+
+    def emit(render, *args) -> None:
+        for (_, pretty), buf in zip(outputs, parts):
+            buf.append(render(pretty, *args))
+
+    def flush() -> None:
+        if state is not None:
+            state.check()
+        for (stream, _), buf in zip(outputs, parts):
+            stream.write(b"".join(buf))
+            buf.clear()
+
+    # for safe symlink following: st_ino values written so far, per st_dev
+    seen_inodes: Dict[int, set[int]] = defaultdict(set)
+
+    def open_dir(idx: int, relpath: str, level: int) -> list:
+        emit(_json_dir_open, {"type": "dir", "name": tree.names[idx], "relpath": relpath}, level)
+        if state is not None:
+            if not state.listed[idx]:
+                flush()
+            state.wait(idx)
+        count = tree.n_children[idx]
+        # a directory already written earlier in this walk is not repeated
+        key = tree.dir_inodes.get(idx)
+        if key is not None:
+            inodes = seen_inodes[key[0]]
+            if key[1] in inodes:
+                tree.flags[idx] |= FLAG_CYCLE
+                count = 0
+            else:
+                inodes.add(key[1])
+        # frame: [node, next child offset, child count, indent level, relpath prefix for children]
+        return [idx, 0, count, level, f"{relpath}{os.sep}" if idx else ""]
+
+    if tree.types[0] != NODE_DIR:
+        emit(_json_leaf, _leaf_nodes(tree, 0, 1, "")[0], 0)
+        flush()
+        return
+
+    # explicit stack instead of recursion
+    frames = [open_dir(0, ".", 0)]
+    while frames:
+        frame = frames[-1]
+        idx, offset, count, level, prefix = frame
+        if offset == count:
+            frames.pop()
+            emit(_json_dir_close, level, bool(count), bool(tree.flags[idx] & FLAG_CYCLE))
+            continue
+        first = tree.first_child[idx]
+        child = first + offset
+        if tree.types[child] == NODE_DIR:
+            frame[1] = offset + 1
+            emit(_json_child_sep, offset, level + 2)
+            frames.append(open_dir(child, prefix + tree.names[child], level + 2))
         else:
-            # root could be a file
-            node: Dict[str, Any] = {
-                "type": "file",
-                "name": os.path.basename(path),
-                "relpath": relpath or os.path.basename(path),
-                "is_link": os.path.islink(path),
-                "ext": os.path.splitext(path)[1]
-            }
-            if show_sizes:
-                try:
-                    size_bytes = os.path.getsize(path)
-                    node["size"] = human_size(size_bytes)
-                    node["size_bytes"] = size_bytes
-                except Exception:
-                    node["size"] = "?"
-            return node
-
-    return make_node(root, relpath="", depth=0)
+            # a run of non-directory siblings is encoded with one dump_json call
+            end = tree.types.find(NODE_DIR, child, first + count)
+            if end == -1:
+                end = first + count
+            frame[1] = end - first
+            emit(_json_leaf_run, _leaf_nodes(tree, child, end, prefix), offset, level + 2)
+        if len(parts[0]) >= 4096:
+            flush()
+    flush()
+
+def tree_to_json_bytes(tree: TreeSoA, pretty: bool = False) -> bytes:
+    buf = io.BytesIO()
+    _write_tree_json(tree, [(buf, pretty)], None)
+    return buf.getvalue()
+
+def stream_tree_json(
+    root: str,
+    out: BinaryIO,
+    max_depth: int = 0,
+    include_hidden: bool = False,
+    show_sizes: bool = False,
+    excludes: set = DEFAULT_EXCLUDES,
+    follow_symlinks: bool = False,
+    max_workers: int = 60,
+    pretty_out: Optional[BinaryIO] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    outputs: List[Tuple[BinaryIO, bool]] = [(out, False)]
+    if pretty_out is not None:
+        outputs.append((pretty_out, True))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        tree, state = _start_scan(root, executor, max_depth, include_hidden, show_sizes, excludes, follow_symlinks, stop)
+        _write_tree_json(tree, outputs, state)
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
 SYSTEM_PROMPT = (
@@ -179,12 +509,17 @@ USER_PROMPT_TEMPLATE = """Analyze the following directory tree (JSON) and respon
 def chunk_text(text: str, max_chars: int) -> List[str]:
     if len(text) <= max_chars:
         return [text]
+    # compact JSON is a single line, so there is nowhere nicer to cut
+    if "\n" not in text:
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
     chunks = []
     start = 0
     n = len(text)
     while start < n:
         end = min(start + max_chars, n)
         if end < n:
+            # bounded to this chunk's window, so the scans add up to O(len(text))
             nl = text.rfind("\n", start, end)
             if nl > start + max_chars * 0.6:
                 end = nl + 1
@@ -192,51 +527,300 @@ def chunk_text(text: str, max_chars: int) -> List[str]:
         start = end
     return chunks
 
-def call_openai_on_tree_json(
+def response_text(resp: Any) -> str:
+    try:
+        return resp.output_text
+    except Exception:
+        # Fallback parse for defensive coding
+        choice_texts = []
+        for item in getattr(resp, "output", []) or []:
+            if getattr(item, "type", "") == "message":
+                for c in getattr(item, "content", []) or []:
+                    if getattr(c, "type", "") in ("output_text", "text"):
+                        choice_texts.append(getattr(c, "text", ""))
+        return "\n".join(choice_texts) if choice_texts else str(resp)
+
+BATCH_POLL_SECONDS = 10.0
+
+async def _create_batched(client: AsyncOpenAI, bodies: List[Dict[str, Any]]) -> List[Any]:
+    # one uploaded JSONL and one batch job instead of a request per chunk
+    lines = [
+        json.dumps({"custom_id": f"c{i}", "method": "POST", "url": "/v1/responses", "body": body}, ensure_ascii=False)
+        for i, body in enumerate(bodies)
+    ]
+    batch_file = await client.files.create(
+        file=("tree_chunks.jsonl", ("\n".join(lines) + "\n").encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h",
+    )
+    print(f"[LLM] Submitted batch {batch.id} with {len(bodies)} requests")
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"batch {batch.id} ended with status {batch.status}")
+
+    content = await client.files.content(batch.output_file_id)
+    results: List[Any] = [None] * len(bodies)
+    for line in content.text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            raise RuntimeError(f"batch request {item.get('custom_id')} failed: {item.get('error') or response.get('body')}")
+        results[int(item["custom_id"][1:])] = Response.model_validate(response["body"])
+    if any(r is None for r in results):
+        raise RuntimeError(f"batch {batch.id} is missing results")
+    return results
+
+def _response_body(model: str, chunk: str) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "input": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": USER_PROMPT_TEMPLATE.format(tree_json=chunk)},
+        ],
+    }
+
+def _join_outputs(results: List[Any]) -> str:
+    outputs: List[str] = []
+    for idx, resp in enumerate(results, 1):
+        if isinstance(resp, BaseException):
+            raise resp
+        outputs.append(response_text(resp))
+
+        if len(results) > 1 and idx < len(results):
+            outputs.append(f"\n---\n_Chunk {idx}/{len(results)} end._\n")
+
+    return "\n".join(outputs).strip() + "\n"
+
+class _LLMRequests:
+    # One responses.create call per chunk, started as soon as the chunk is
+    # added, or all chunks collected for one batch job. At most max_concurrency
+    # calls are in flight, which keeps a large tree under the rate limit. The
+    # client is only made when the API key is set; collect() reports a missing one.
+    def __init__(
+        self,
+        model: str,
+        api_key_env: str,
+        base_url: Optional[str],
+        use_batch_api: bool,
+        max_concurrency: int,
+    ):
+        self.model = model
+        self.api_key_env = api_key_env
+        self.use_batch_api = use_batch_api
+        self.limit = asyncio.Semaphore(max_concurrency)
+        self.bodies: List[Dict[str, Any]] = []
+        self.requests: List[asyncio.Future] = []
+        self.client: Optional[AsyncOpenAI] = None
+        api_key = os.environ.get(api_key_env)
+        if api_key:
+            client_kwargs = {"api_key": api_key}
+            if base_url:
+                client_kwargs["base_url"] = base_url
+            self.client = AsyncOpenAI(**client_kwargs)
+
+    def add(self, chunk: str) -> None:
+        self.bodies.append(_response_body(self.model, chunk))
+        # batches need every chunk up front, so only direct calls start early
+        if self.client is not None and not self.use_batch_api:
+            self._start(self.bodies[-1])
+
+    def _start(self, body: Dict[str, Any]) -> None:
+        self.requests.append(asyncio.ensure_future(self._create(body)))
+
+    async def _create(self, body: Dict[str, Any]) -> Any:
+        async with self.limit:
+            print("[LLM] Calling openai")
+            return await self.client.responses.create(**body)
+
+    async def collect(self) -> str:
+        if self.client is None:
+            raise RuntimeError(f"{self.api_key_env} is not set")
+        if self.use_batch_api:
+            if len(self.bodies) > 1:
+                print("[LLM] Calling openai (batch)")
+                return _join_outputs(await _create_batched(self.client, self.bodies))
+            # a single chunk is sent directly rather than as a batch of one
+            self._start(self.bodies[0])
+        # gather keeps the responses in chunk order
+        return _join_outputs(await asyncio.gather(*self.requests, return_exceptions=True))
+
+    async def aclose(self) -> None:
+        for request in self.requests:
+            request.cancel()
+        if self.client is not None:
+            await self.client.close()
+
+async def acall_openai_on_tree_json(
     tree_json_str: str,
     model: str = "gpt-4o-mini",
     max_chars: int = 12000,
     api_key_env: str = "OPENAI_API_KEY",
     base_url: Optional[str] = None,
+    use_batch_api: bool = False,
+    max_concurrency: int = 4,
 ) -> str:
-    api_key = os.environ.get(api_key_env)
-    if not api_key:
-        raise RuntimeError(f"{api_key_env} is not set")
-
-    client_kwargs = {"api_key": api_key}
-    if base_url:
-        client_kwargs["base_url"] = base_url
-    client = OpenAI(**client_kwargs)
+    llm = _LLMRequests(model, api_key_env, base_url, use_batch_api, max_concurrency)
+    try:
+        for chunk in chunk_text(tree_json_str, max_chars=max_chars):
+            llm.add(chunk)
+        return await llm.collect()
+    finally:
+        await llm.aclose()
 
-    chunks = chunk_text(tree_json_str, max_chars=max_chars)
-    outputs: List[str] = []
+def call_openai_on_tree_json(
+    tree_json_str: str,
+    model: str = "gpt-4o-mini",
+    max_chars: int = 12000,
+    api_key_env: str = "OPENAI_API_KEY",
+    base_url: Optional[str] = None,
+    use_batch_api: bool = False,
+    max_concurrency: int = 4,
+) -> str:
+    return asyncio.run(acall_openai_on_tree_json(
+        tree_json_str=tree_json_str,
+        model=model,
+        max_chars=max_chars,
+        api_key_env=api_key_env,
+        base_url=base_url,
+        use_batch_api=use_batch_api,
+        max_concurrency=max_concurrency,
+    ))
+
+class _JsonOutError(OSError):
+    pass
+
+class _JsonOutSink:
+    # Raises _JsonOutError for failures on the wrapped file, so main can tell
+    # them apart from OSErrors raised by the scan or the LLM client.
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+
+    def write(self, data: bytes) -> int:
+        try:
+            return self.stream.write(data)
+        except OSError as e:
+            raise _JsonOutError(*e.args) from e
 
-    for idx, chunk in enumerate(chunks, 1):
-        user_prompt = USER_PROMPT_TEMPLATE.format(tree_json=chunk)
-        print("[LLM] Calling openai")
-        resp = client.responses.create(
-            model=model,
-            input=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
+    def close(self) -> None:
         try:
-            outputs.append(resp.output_text)
-        except Exception:
-            # Fallback parse for defensive coding
-            choice_texts = []
-            for item in getattr(resp, "output", []) or []:
-                if getattr(item, "type", "") == "message":
-                    for c in getattr(item, "content", []) or []:
-                        if getattr(c, "type", "") in ("output_text", "text"):
-                            choice_texts.append(getattr(c, "text", ""))
-            outputs.append("\n".join(choice_texts) if choice_texts else str(resp))
-
-        if len(chunks) > 1 and idx < len(chunks):
-            outputs.append(f"\n---\n_Chunk {idx}/{len(chunks)} end._\n")
+            self.stream.close()
+        except OSError as e:
+            raise _JsonOutError(*e.args) from e
+
+class _ChunkWriter:
+    # Binary sink for stream_tree_json that hands out max_chars-sized text
+    # chunks as soon as they fill up. Compact JSON has no raw newlines, so
+    # these are exactly the chunks chunk_text would cut from the whole string.
+    def __init__(self, max_chars: int, on_chunk: Callable[[str], None], copy_to: Optional[BinaryIO] = None):
+        self.max_chars = max_chars
+        self.on_chunk = on_chunk
+        self.copy_to = copy_to
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        if self.copy_to is not None:
+            self.copy_to.write(data)
+        text = self.decoder.decode(data)
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.max_chars:
+            text = "".join(self.parts)
+            end = len(text) - len(text) % self.max_chars
+            for start in range(0, end, self.max_chars):
+                self.on_chunk(text[start:start + self.max_chars])
+            self.parts = [text[end:]]
+            self.size = len(text) - end
+        return len(data)
+
+    def close(self) -> None:
+        text = "".join(self.parts) + self.decoder.decode(b"", final=True)
+        self.parts = []
+        self.size = 0
+        if text:
+            self.on_chunk(text)
+
+async def acall_openai_on_tree_stream(
+    scan_kwargs: Dict[str, Any],
+    compact_out: Optional[BinaryIO] = None,
+    pretty_out: Optional[BinaryIO] = None,
+    on_tree_written: Optional[Callable[[], None]] = None,
+    model: str = "gpt-4o-mini",
+    max_chars: int = 12000,
+    api_key_env: str = "OPENAI_API_KEY",
+    base_url: Optional[str] = None,
+    use_batch_api: bool = False,
+    max_concurrency: int = 4,
+) -> str:
+    # Scans with stream_tree_json on a worker thread and sends each chunk of
+    # compact JSON to the LLM as soon as it is streamed, so wall-clock time is
+    # about max(scan, LLM) instead of their sum.
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue = asyncio.Queue()
+    # set when this coroutine ends, so a cancelled or failed run (Ctrl-C) does
+    # not wait for the rest of the tree to be walked
+    stop = threading.Event()
+
+    def on_chunk(chunk: str) -> None:
+        loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+    def scan() -> None:
+        try:
+            writer = _ChunkWriter(max_chars, on_chunk, copy_to=compact_out)
+            stream_tree_json(out=writer, pretty_out=pretty_out, stop=stop, **scan_kwargs)
+            writer.close()
+        finally:
+            loop.call_soon_threadsafe(chunks.put_nowait, None)
 
-    return "\n".join(outputs).strip() + "\n"
+    scanning = loop.run_in_executor(None, scan)
+
+    llm = _LLMRequests(model, api_key_env, base_url, use_batch_api, max_concurrency)
+    try:
+        while (chunk := await chunks.get()) is not None:
+            llm.add(chunk)
+        await scanning
+        if on_tree_written is not None:
+            on_tree_written()
+        return await llm.collect()
+    finally:
+        stop.set()
+        # nobody awaits a scan left running, so drop its result
+        scanning.cancel()
+        await llm.aclose()
+
+def call_openai_on_tree_stream(
+    scan_kwargs: Dict[str, Any],
+    compact_out: Optional[BinaryIO] = None,
+    pretty_out: Optional[BinaryIO] = None,
+    on_tree_written: Optional[Callable[[], None]] = None,
+    model: str = "gpt-4o-mini",
+    max_chars: int = 12000,
+    api_key_env: str = "OPENAI_API_KEY",
+    base_url: Optional[str] = None,
+    use_batch_api: bool = False,
+    max_concurrency: int = 4,
+) -> str:
+    return asyncio.run(acall_openai_on_tree_stream(
+        scan_kwargs,
+        compact_out=compact_out,
+        pretty_out=pretty_out,
+        on_tree_written=on_tree_written,
+        model=model,
+        max_chars=max_chars,
+        api_key_env=api_key_env,
+        base_url=base_url,
+        use_batch_api=use_batch_api,
+        max_concurrency=max_concurrency,
+    ))
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Generate a JSON directory tree and get LLM suggestions.')
@@ -256,6 +840,8 @@ def parse_arguments():
                         help='Show file sizes in the JSON output.')
     parser.add_argument('--follow_symlinks', action='store_true',
                         help='Follow symbolic links.')
+    parser.add_argument('--max_workers', type=int, default=60,
+                        help='The number of threads used to scan directories.')
     parser.add_argument('--no_default_excludes', action='store_true',
                         help='Do not exclude default directories like .git, node_modules, etc.')
     parser.add_argument('--exclude', type=str, nargs='*', default=[],
@@ -268,6 +854,10 @@ def parse_arguments():
                         help='The environment variable for the OpenAI API key.')
     parser.add_argument('--base_url', type=str, default=None,
                         help='The base URL for the OpenAI API.')
+    parser.add_argument('--use_batch_api', action='store_true',
+                        help='Send multiple chunks as one Batch API job (cheaper, but may take hours).')
+    parser.add_argument('--max_concurrency', type=int, default=4,
+                        help='The maximum number of chunk requests sent to the LLM at once.')
     return parser.parse_args()
 
 
@@ -279,45 +869,68 @@ def main():
         excludes |= set(DEFAULT_EXCLUDES)
     excludes |= set(args.exclude or [])
 
-    tree = build_tree_json(
+    scan_kwargs = dict(
         root=args.path,
         max_depth=args.max_depth,
         include_hidden=args.include_hidden,
         show_sizes=args.show_sizes,
         excludes=excludes,
         follow_symlinks=args.follow_symlinks,
+        max_workers=args.max_workers,
     )
 
-    # Save JSON
+    # The LLM gets compact JSON (to save tokens). --json_out gets the same bytes,
+    # or indented JSON with --pretty; without --json_out it is printed indented.
+    json_file = None
     if args.json_out:
         try:
-            with open(args.json_out, "w", encoding="utf-8") as f:
-                if args.pretty:
-                    json.dump(tree, f, indent=2, ensure_ascii=False)
-                else:
-                    json.dump(tree, f, separators=(",", ":"), ensure_ascii=False)
-            print(f"Wrote JSON tree to: {args.json_out}")
+            json_file = _JsonOutSink(open(args.json_out, "wb"))
         except OSError as e:
             print(f"Error writing {args.json_out}: {e}", file=sys.stderr)
             sys.exit(1)
-    else:
-        print(json.dumps(tree, indent=2, ensure_ascii=False))
-
-    # Prepare compact JSON for LLM (to save tokens)
-    tree_json_str = json.dumps(tree, ensure_ascii=False, separators=(",", ":"))
+    # printed only once the scan is done, so it does not interleave with LLM logs
+    stdout_buf = io.BytesIO() if json_file is None else None
+    tree_done = False
+
+    def tree_written() -> None:
+        nonlocal tree_done
+        if json_file is not None:
+            json_file.close()
+            print(f"Wrote JSON tree to: {args.json_out}")
+        else:
+            sys.stdout.buffer.write(stdout_buf.getvalue() + b"\n")
+            sys.stdout.flush()
+        tree_done = True
 
-    # Call LLM
+    # Scan, save JSON and call LLM; chunks go out while the scan is still running
     try:
-        response_text = call_openai_on_tree_json(
-            tree_json_str=tree_json_str,
+        response_text = call_openai_on_tree_stream(
+            scan_kwargs,
+            compact_out=json_file if json_file is not None and not args.pretty else None,
+            pretty_out=stdout_buf if json_file is None else (json_file if args.pretty else None),
+            on_tree_written=tree_written,
             model=args.model,
             max_chars=args.max_chars,
             api_key_env=args.api_key_env,
             base_url=args.base_url,
+            use_batch_api=args.use_batch_api,
+            max_concurrency=args.max_concurrency,
         )
+    except _JsonOutError as e:
+        print(f"Error writing {args.json_out}: {e}", file=sys.stderr)
+        sys.exit(1)
     except Exception as e:
+        # scan errors surface before the tree is done; they are not LLM errors
+        if not tree_done:
+            raise
         print(f"[LLM] Error: {e}", file=sys.stderr)
         sys.exit(2)
+    finally:
+        if json_file is not None:
+            try:
+                json_file.close()
+            except _JsonOutError:
+                pass  # the error that got us here is the one reported
 
     # Save LLM response
     try: